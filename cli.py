@@ -3,24 +3,42 @@
 
 import sys
 import os
+import re
 import subprocess
 import argparse
+import threading
+import functools
 from pathlib import Path
 from datetime import datetime
-from dotenv import load_dotenv
 from diff import main as diff_main
 
 # Configuration: Set to False to hide codex output
 SHOW_CODEX_OUTPUT = True
 
+# Directory containing this script, resolved once at import
+SCRIPT_DIR = Path(__file__).resolve().parent
+
 # Log directory
-LOG_DIR = Path(__file__).parent / "cli-logs"
+LOG_DIR = SCRIPT_DIR / "cli-logs"
+
+PROMPT_FILE = SCRIPT_DIR / "prompt.md"
+
+# Matches the .n<language> extension of natural code files
+NATURAL_EXT_RE = re.compile(r"\.n(\w+)$")
 
-PROMPT_FILE = Path(__file__).parent / "prompt.md"
+# Set once .env has been looked for, so repeat calls in one process are no-ops
+_env_loaded = False
 
+# Size of each raw read when forwarding codex output
+OUTPUT_CHUNK_SIZE = 64 * 1024
 
+# Flush the log file after roughly this many bytes instead of on every write
+LOG_FLUSH_BYTES = 16 * 1024
+
+
+@functools.lru_cache(maxsize=1)
 def read_prompt_file():
-    """Read the contents of the prompt file"""
+    """Read the contents of the prompt file (cached after the first read)"""
     with open(PROMPT_FILE, "r", encoding="utf-8") as f:
         return f.read()
 
@@ -30,9 +48,11 @@ def ensure_log_dir():
     LOG_DIR.mkdir(exist_ok=True)
 
 
-def get_log_filepath(input_file):
+def get_log_filepath(input_file, now=None):
     """Generate log file path based on input file and timestamp"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if now is None:
+        now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
     input_filename = Path(input_file).stem
     log_filename = f"{input_filename}_{timestamp}.log"
     return LOG_DIR / log_filename
@@ -40,11 +60,20 @@ def get_log_filepath(input_file):
 
 def load_env_file():
     """Load environment variables from .env file"""
+    global _env_loaded
+    # Nothing to load if already done, or the key was exported by the caller
+    if _env_loaded or os.getenv("GROQ_API"):
+        return
+    _env_loaded = True
+
+    # Imported here so argument parsing and --help don't pay for it
+    from dotenv import load_dotenv
+
     # Try current working directory first (where the user runs the command)
     env_path = Path.cwd() / ".env"
     if not env_path.exists():
         # Fall back to script directory (for development mode)
-        env_path = Path(__file__).parent / ".env"
+        env_path = SCRIPT_DIR / ".env"
 
     if env_path.exists():
         load_dotenv(env_path)
@@ -54,8 +83,6 @@ def load_env_file():
 
 def read_natural_code_file(filepath):
     """Read the contents of a .n<language> file"""
-    import re
-
     path = Path(filepath)
 
     if not path.exists():
@@ -63,7 +90,7 @@ def read_natural_code_file(filepath):
         sys.exit(1)
 
     # Extract language from .n<lang> extension
-    match = re.search(r"\.n(\w+)$", filepath)
+    match = NATURAL_EXT_RE.search(filepath)
     if not match:
         print(
             "Error: File must have .n<language> extension (e.g., .npy, .njava, .njs)",
@@ -81,6 +108,37 @@ def read_natural_code_file(filepath):
         sys.exit(1)
 
 
+def forward_output(pipe, log_handle, on_output=None):
+    """
+    Copy raw codex output from pipe to the log file, and to the terminal.
+
+    If on_output is given, each chunk is passed to it instead of the terminal.
+    """
+    unflushed = 0
+    try:
+        fd = pipe.fileno()
+        log = log_handle.buffer
+        # The terminal is only needed when no callback takes the output
+        stdout = sys.stdout.buffer if on_output is None else None
+
+        # Read whatever is available instead of iterating line by line
+        while chunk := os.read(fd, OUTPUT_CHUNK_SIZE):
+            if on_output is None:
+                stdout.write(chunk)
+                stdout.flush()
+            else:
+                on_output(chunk)
+            log.write(chunk)
+            unflushed += len(chunk)
+            if unflushed >= LOG_FLUSH_BYTES:
+                log.flush()
+                unflushed = 0
+    except Exception as e:
+        print(f"Error forwarding output: {e}", file=sys.stderr)
+    finally:
+        log_handle.close()
+
+
 def cli_prompt(tagged_file):
     """
     Collect and construct the full prompt for codex.
@@ -114,17 +172,78 @@ Now please create the desired code file (if not already created) for the user to
     return prompt
 
 
+def _spawn_codex(cmd, env, log_handle, show_output, wait, on_output=None):
+    """
+    Launch codex with its output routed to the log file (and the terminal).
+
+    Args:
+        cmd: Full codex command line
+        env: Environment for the codex process
+        log_handle: Open log file; closed once codex output has been written
+        show_output: If True, also show codex output on the terminal
+        wait: If True, block until codex exits
+        on_output: Optional callback receiving raw output chunks instead of the terminal
+
+    Returns:
+        Exit code of codex if wait is True, otherwise its PID
+    """
+    # Tee through a pipe when output goes anywhere but the log
+    piped = show_output or on_output is not None
+
+    process = subprocess.Popen(
+        cmd,
+        env=env,
+        # Otherwise codex writes to the log directly
+        stdout=subprocess.PIPE if piped else log_handle,
+        stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL,
+        bufsize=0,
+        close_fds=False,
+    )
+
+    if not piped:
+        # The child has its own copy of the log file descriptor
+        log_handle.close()
+        return process.wait() if wait else process.pid
+
+    if wait:
+        with process:
+            forward_output(process.stdout, log_handle, on_output)
+        return process.returncode
+
+    # Forward raw chunks to both terminal and log file in the background
+    forward_thread = threading.Thread(
+        target=forward_output,
+        args=(process.stdout, log_handle, on_output),
+        daemon=True,
+    )
+    forward_thread.start()
+    return process.pid
+
+
 def run_codex(
-    prompt, prompt_file, groq_api_key, log_file, show_output=SHOW_CODEX_OUTPUT
+    prompt,
+    prompt_file,
+    groq_api_key,
+    log_file,
+    show_output=SHOW_CODEX_OUTPUT,
+    now=None,
+    wait=False,
+    on_output=None,
 ):
-    """Run codex with the given prompt in the background"""
+    """
+    Run codex with the given prompt.
+
+    Returns the PID of the background codex process, or its exit code
+    when wait is True. If on_output is given, it receives each raw chunk
+    of codex output as it arrives.
+    """
     if not groq_api_key:
         print("Error: GROQ_API key not found in .env file", file=sys.stderr)
         sys.exit(1)
 
     # Set up environment with GROQ_API_KEY
-    env = os.environ.copy()
-    env["GROQ_API_KEY"] = groq_api_key
+    env = {**os.environ, "GROQ_API_KEY": groq_api_key}
 
     # Use the prompt that was passed in (already constructed by cli_prompt)
     full_prompt = prompt
@@ -143,57 +262,26 @@ def run_codex(
         # Open log file for writing
         log_handle = open(log_file, "w", encoding="utf-8")
 
-        # Write header to log file
+        # Write header to log file, using the same timestamp as the log filename
+        if now is None:
+            now = datetime.now()
         log_handle.write("=== Codex Execution Log ===\n")
-        log_handle.write(f"Timestamp: {datetime.now().isoformat()}\n")
-        log_handle.write(
-            f"Prompt: {prompt[:100]}{'...' if len(prompt) > 100 else ''}\n"
-        )
+        log_handle.write(f"Timestamp: {now.isoformat()}\n")
+        log_handle.write(f"Prompt file: {prompt_file}\n")
+        if PROMPT_FILE.exists():
+            log_handle.write(f"System prompt file: {PROMPT_FILE}\n")
+        preview = prompt[:100]
+        suffix = "..." if len(prompt) > len(preview) else ""
+        log_handle.write(f"Prompt: {preview}{suffix}\n")
         log_handle.write(f"{'=' * 50}\n\n")
         log_handle.flush()
 
-        # Determine output streams based on configuration
-        if show_output:
-            # Use Tee-like behavior: show on terminal AND write to log
-            stdout_stream = subprocess.PIPE
-            stderr_stream = subprocess.STDOUT
-        else:
-            # Only write to log file, don't show on terminal
-            stdout_stream = log_handle
-            stderr_stream = subprocess.STDOUT
-
-        # Run codex in the background
-        process = subprocess.Popen(
-            cmd,
-            env=env,
-            stdout=stdout_stream,
-            stderr=stderr_stream,
-            stdin=subprocess.DEVNULL,
-            text=True,
-            bufsize=1,
-        )
-
-        # If showing output, we need to tee the output to both terminal and log file
-        if show_output and stdout_stream == subprocess.PIPE:
-
-            def tee_output():
-                try:
-                    for line in process.stdout:
-                        print(line, end="")  # Print to terminal
-                        log_handle.write(line)  # Write to log
-                        log_handle.flush()
-                    log_handle.close()
-                except Exception as e:
-                    print(f"Error in tee_output: {e}", file=sys.stderr)
-
-            import threading
+        result = _spawn_codex(cmd, env, log_handle, show_output, wait, on_output)
 
-            tee_thread = threading.Thread(target=tee_output, daemon=True)
-            tee_thread.start()
-
-        print(f"process started (PID: {process.pid})")
+        if not wait:
+            print(f"process started (PID: {result})")
         print(f"Log file: {log_file}")
-        return process.pid
+        return result
 
     except FileNotFoundError:
         print(
@@ -234,8 +322,9 @@ def main():
     # Get absolute path to the prompt file
     tagged_file = str(Path(args.file).resolve())
 
-    # Generate log file path
-    log_file = get_log_filepath(args.file)
+    # Generate log file path - one clock read shared with the log header
+    now = datetime.now()
+    log_file = get_log_filepath(args.file, now)
 
     print(f"Running codex with prompt from {args.file}...")
 
@@ -245,69 +334,21 @@ def main():
     # Run codex
     if args.wait:
         # If --wait flag is used, run synchronously
-        env = os.environ.copy()
-        env["GROQ_API_KEY"] = groq_api_key
-
-        # Open log file for writing
-        with open(log_file, "w", encoding="utf-8") as log_handle:
-            # Write header to log file
-            log_handle.write("=== Codex Execution Log ===\n")
-            log_handle.write(f"Timestamp: {datetime.now().isoformat()}\n")
-            log_handle.write(f"Prompt file: {args.file}\n")
-            if PROMPT_FILE.exists():
-                log_handle.write(f"System prompt file: {PROMPT_FILE}\n")
-            log_handle.write(
-                f"Prompt: {full_prompt[:100]}{'...' if len(full_prompt) > 100 else ''}\n"
-            )
-            log_handle.write(f"{'=' * 50}\n\n")
-            log_handle.flush()
-
-            # Determine output streams based on configuration
-            if SHOW_CODEX_OUTPUT:
-                # Show on terminal AND write to log using tee-like behavior
-                result = subprocess.run(
-                    [
-                        "codex",
-                        "exec",
-                        "--profile",
-                        "groq",
-                        "--model",
-                        "openai/gpt-oss-120b",
-                        full_prompt,
-                    ],
-                    env=env,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                )
-                # Write to both terminal and log
-                print(result.stdout, end="")
-                log_handle.write(result.stdout)
-            else:
-                # Only write to log file, don't show on terminal
-                result = subprocess.run(
-                    [
-                        "codex",
-                        "exec",
-                        "--profile",
-                        "groq",
-                        "--model",
-                        "openai/gpt-oss-120b",
-                        full_prompt,
-                    ],
-                    env=env,
-                    stdout=log_handle,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                )
-
-        print(f"Log file: {log_file}")
+        returncode = run_codex(
+            full_prompt,
+            tagged_file,
+            groq_api_key,
+            log_file,
+            show_output=SHOW_CODEX_OUTPUT,
+            now=now,
+            wait=True,
+        )
 
-        if result.returncode == 0:
+        if returncode == 0:
             print("Codex completed successfully")
         else:
-            print(f"Codex exited with code {result.returncode}", file=sys.stderr)
-            sys.exit(result.returncode)
+            print(f"Codex exited with code {returncode}", file=sys.stderr)
+            sys.exit(returncode)
     else:
         # Run in background
         pid = run_codex(
@@ -316,6 +357,7 @@ def main():
             groq_api_key,
             log_file,
             show_output=SHOW_CODEX_OUTPUT,
+            now=now,
         )
         if SHOW_CODEX_OUTPUT:
             print(f"Codex is running in the background (PID: {pid}) - output visible")
@@ -6,64 +6,221 @@ Generates the terminal command to run the transpiled code
 
 import os
 import re
-from groq import Groq
-from dotenv import load_dotenv
+import json
+import time
+import sqlite3
+import threading
+import shlex
+import hashlib
+from contextlib import closing
+from pathlib import Path
 
+# Shared Groq client - reused across calls so the keep-alive connection pool is kept
+_client = None
+_client_lock = threading.Lock()
 
-def generate_run_command(file_path, changes_summary):
-    """
-    Generate terminal command to run the transpiled code using Groq inference.
+# GROQ_API key, resolved on first use so .env is loaded at most once per process
+_api_key = None
+
+
+def _get_api_key():
+    """Return the GROQ_API key, loading .env the first time it's needed"""
+    global _api_key
+    if _api_key is None:
+        # Imported lazily - the table and cache paths never need it
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _api_key = os.getenv("GROQ_API")
+    return _api_key
+
+
+def _get_client(api_key):
+    """Return the shared Groq client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None or _client.api_key != api_key:
+            # Imported lazily - groq pulls in httpx/pydantic, which is slow to load
+            from groq import Groq
+
+            _client = Groq(api_key=api_key)
+        return _client
 
-    Args:
-        file_path: Original .n<lang> file path (e.g., "hello.npy")
-        changes_summary: Git diff summary showing what files were created/modified
+
+# Model settings for command generation - temperature 0 keeps results deterministic
+MODEL = "llama-3.3-70b-versatile"
+TEMPERATURE = 0
+
+# Fenced code blocks in model output - ```bash first, then any ``` block.
+# The closing fence is optional since generation stops right before it
+BASH_BLOCK_RE = re.compile(r"```bash\s*\n(.+?)(?:\n```|$)", re.DOTALL)
+CODE_BLOCK_RE = re.compile(r"```\s*\n(.+?)(?:\n```|$)", re.DOTALL)
+
+# Output budget per command - a one-line command in a bash block is ~20 tokens,
+# with headroom for long classpaths; replies that still hit it are rejected
+MAX_TOKENS_PER_COMMAND = 64
+
+# End single-command generation at the closing fence
+STOP_SEQUENCES = ["\n```"]
+
+# Characters of the diff report sent with each task - the changed-file list at
+# the top is always sent in full, even when it runs past this
+CHANGES_SUMMARY_CHARS = 200
+
+# Run commands for well-known target extensions - these never need the LLM
+COMMAND_TABLE = {
+    ".py": "python {f}",
+    ".js": "node {f}",
+    ".go": "go run {f}",
+    ".ts": "tsx {f}",
+    ".tsx": "tsx {f}",
+    ".rb": "ruby {f}",
+    ".php": "php {f}",
+    ".sh": "bash {f}",
+    ".java": "javac {f} && java -cp {dir} {base}",
+}
+
+
+def _resolve_known_command(file_path):
+    """
+    Build the run command for a .n<lang> file whose target language is known.
 
     Returns:
-        dict: {
-            "success": bool,
-            "command": str,
-            "error": str
-        }
+        Command string, or None if the extension isn't in COMMAND_TABLE
     """
-    # Load environment and get API key
-    load_dotenv()
-    api_key = os.getenv("GROQ_API")
+    stem, ext = os.path.splitext(file_path)
+    if not ext.startswith(".n"):
+        return None
 
-    if not api_key:
-        return {
-            "success": False,
-            "command": None,
-            "error": "GROQ_API key not found in .env",
-        }
+    # hello.npy -> hello.py
+    target_ext = "." + ext[2:]
+    template = COMMAND_TABLE.get(target_ext)
+    if template is None:
+        return None
 
-    # Build prompt for Groq
-    prompt = f"""Generate the terminal command to run the transpiled code.
+    return template.format(
+        f=shlex.quote(stem + target_ext),
+        dir=shlex.quote(os.path.dirname(stem) or "."),
+        base=shlex.quote(os.path.basename(stem)),
+    )
 
-Original file: {file_path}
-(e.g., if original is "hello.npy", the transpiled file will be "hello.py")
 
-Changes made by the transpiler:
-{changes_summary[:600]}
+# Generated commands are cached in memory and persisted to a local SQLite store
+_cache = {}
+CACHE_DB = Path.home() / ".cache" / "natural-code" / "commands.sqlite"
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
 
-Your task: Generate the exact terminal command to run the main transpiled file.
 
-Examples:
-- If original: hello.npy → command: python hello.py
-- If original: server.njs → command: node server.js
-- If original: app.ngo → command: go run app.go
-- If original: main.nts → command: tsx main.ts
+def _extract_files_from_changes(changes_summary):
+    """
+    List created/modified files from the summary section of a diff.main report.
+
+    Whitespace around entries is ignored, so reports that only differ
+    cosmetically produce the same list.
+    """
+    files = set()
+    lines = iter(changes_summary.splitlines())
+    for line in lines:
+        if line.strip() == "Changes:":
+            break
+    for line in lines:
+        prefix, _, name = line.strip().partition(" ")
+        if prefix not in ("+", "~", "-"):
+            break
+        if prefix != "-":
+            files.add(name.strip())
+    return sorted(files)
+
+
+def _cache_key(model, temperature, file_path, files):
+    """
+    Hash the request into a stable cache key.
+
+    Keyed on the files involved rather than the full diff text, so runs that
+    touch the same files reuse the command even when the diff contents differ.
+    The file path is made absolute so same-named files in different projects
+    don't share an entry.
+    """
+    payload = json.dumps(
+        {
+            "m": model,
+            "t": temperature,
+            "file": os.path.abspath(file_path),
+            "files": files,
+        },
+        sort_keys=True,
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
 
-Return ONLY the terminal command in this format:
-```bash
-<command>
-```
-"""
+
+def _open_cache_db():
+    """Open the persistent command cache, creating it if needed"""
+    CACHE_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS commands "
+        "(hash TEXT PRIMARY KEY, command TEXT, ts INTEGER)"
+    )
+    return conn
+
+
+def _get_cached_command(key):
+    """Look up a command in memory, then in the persistent cache"""
+    if key in _cache:
+        return _cache[key]
 
     try:
-        # Call Groq API
-        client = Groq(api_key=api_key)
+        with closing(_open_cache_db()) as conn:
+            row = conn.execute(
+                "SELECT command FROM commands WHERE hash = ? AND ts >= ?",
+                (key, int(time.time()) - CACHE_TTL_SECONDS),
+            ).fetchone()
+    except (sqlite3.Error, OSError):
+        return None
+
+    if row:
+        _cache[key] = row[0]
+        return row[0]
+    return None
 
-        system_prompt = """You are a terminal command expert for a natural code transpiler system.
+
+def _store_cached_command(key, command):
+    """Remember a generated command in memory and in the persistent cache"""
+    _cache[key] = command
+    try:
+        with closing(_open_cache_db()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO commands VALUES (?, ?, ?)",
+                (key, command, int(time.time())),
+            )
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def forget_command(file_path, changes_summary):
+    """Drop the cached command for one run, e.g. after it failed to execute"""
+    key = _job_cache_key(file_path, changes_summary)
+    _cache.pop(key, None)
+    try:
+        with closing(_open_cache_db()) as conn, conn:
+            conn.execute("DELETE FROM commands WHERE hash = ?", (key,))
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def clear_cache():
+    """Drop all cached commands, in memory and on disk"""
+    _cache.clear()
+    try:
+        with closing(_open_cache_db()) as conn, conn:
+            conn.execute("DELETE FROM commands")
+    except (sqlite3.Error, OSError):
+        pass
+
+
+# Static parts of the prompts are kept byte-identical across calls (and ahead of
+# any per-run content) so the provider's prompt prefix cache can be reused
+SYSTEM_PROMPT = """You are a terminal command expert for a natural code transpiler system.
 
 The system works like this:
 - Users write code in .n<language> files (e.g., .npy for Python, .njs for JavaScript)
@@ -94,18 +251,126 @@ Rules:
 
 Do NOT add explanations, do NOT add extra text. ONLY the command in a bash code block."""
 
+PROMPT_INSTRUCTIONS = """Generate the terminal command to run the transpiled code.
+
+Your task: Generate the exact terminal command to run the main transpiled file.
+
+Examples:
+- If original: hello.npy → command: python hello.py
+- If original: server.njs → command: node server.js
+- If original: app.ngo → command: go run app.go
+- If original: main.nts → command: tsx main.ts
+
+Return ONLY the terminal command in this format:
+```bash
+<command>
+```
+"""
+
+
+def _summary_excerpt(changes_summary):
+    """
+    Leading part of a diff.main report to send to Groq - the whole changed-file
+    list, or CHANGES_SUMMARY_CHARS characters if that is longer.
+    """
+    end = 0
+    lines = changes_summary.splitlines(keepends=True)
+    if lines and lines[0].strip() == "Changes:":
+        for line in lines:
+            if end and line[:2] not in ("+ ", "~ ", "- "):
+                break
+            end += len(line)
+    return changes_summary[: max(end, CHANGES_SUMMARY_CHARS)]
+
+
+def _task_details(file_path, changes_summary):
+    """Per-run part of the Groq prompt describing one file to run"""
+    return f"""Original file: {file_path}
+(e.g., if original is "hello.npy", the transpiled file will be "hello.py")
+
+Changes made by the transpiler:
+{_summary_excerpt(changes_summary)}
+"""
+
+
+def _job_cache_key(file_path, changes_summary):
+    """Cache key for generating the run command of one file"""
+    return _cache_key(
+        MODEL, TEMPERATURE, file_path, _extract_files_from_changes(changes_summary)
+    )
+
+
+def generate_run_command(file_path, changes_summary):
+    """
+    Generate terminal command to run the transpiled code.
+
+    Known target languages are resolved from COMMAND_TABLE; anything else
+    falls back to Groq inference.
+
+    Args:
+        file_path: Original .n<lang> file path (e.g., "hello.npy")
+        changes_summary: Git diff summary showing what files were created/modified
+
+    Returns:
+        dict: {
+            "success": bool,
+            "command": str,
+            "error": str
+        }
+    """
+    # Known languages map straight to their interpreter without an API call
+    command = _resolve_known_command(file_path)
+    if command:
+        return {"success": True, "command": command, "error": None}
+
+    # Repeat runs over the same files reuse the previously generated command
+    cache_key = _job_cache_key(file_path, changes_summary)
+    if TEMPERATURE == 0:
+        cached = _get_cached_command(cache_key)
+        if cached:
+            return {"success": True, "command": cached, "error": None}
+
+    # Load environment and get API key
+    api_key = _get_api_key()
+
+    if not api_key:
+        return {
+            "success": False,
+            "command": None,
+            "error": "GROQ_API key not found in .env",
+        }
+
+    # Build prompt for Groq - static instructions first, per-run details last
+    prompt = f"{PROMPT_INSTRUCTIONS}\n{_task_details(file_path, changes_summary)}"
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+    try:
+        # Call Groq API
+        client = _get_client(api_key)
+
         response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.1,
-            max_tokens=100,
+            messages=messages,
+            model=MODEL,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS_PER_COMMAND,
+            stop=STOP_SEQUENCES,
         )
 
+        # A reply cut off at the token limit may hold half a command - never run it
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            return {
+                "success": False,
+                "command": None,
+                "error": "Generated command was truncated at the token limit",
+            }
+
         # Parse command from response
-        raw_output = response.choices[0].message.content.strip()
+        raw_output = choice.message.content.strip()
         command = parse_bash_block(raw_output)
 
         if not command:
@@ -115,6 +380,9 @@ Do NOT add explanations, do NOT add extra text. ONLY the command in a bash code
                 "error": "Empty command generated",
             }
 
+        if TEMPERATURE == 0:
+            _store_cached_command(cache_key, command)
+
         return {"success": True, "command": command, "error": None}
 
     except Exception as e:
@@ -129,14 +397,103 @@ def parse_bash_block(raw_output):
     ```
     """
     # Extract content between ```bash and ```
-    match = re.search(r"```bash\s*\n(.+?)\n```", raw_output, re.DOTALL)
+    match = BASH_BLOCK_RE.search(raw_output)
     if match:
         return match.group(1).strip().split("\n")[0].strip()
 
     # Fallback: try generic code block
-    match = re.search(r"```\s*\n(.+?)\n```", raw_output, re.DOTALL)
+    match = CODE_BLOCK_RE.search(raw_output)
     if match:
         return match.group(1).strip().split("\n")[0].strip()
 
     # Fallback: use raw output first line
     return raw_output.strip().split("\n")[0].strip()
+
+
+def _generate_batch(jobs):
+    """
+    Ask Groq for the run commands of several files in a single completion.
+
+    Returns:
+        list: One command per job, or None if the call failed or the reply
+        didn't contain exactly one bash block per job
+    """
+    api_key = _get_api_key()
+    if not api_key:
+        return None
+
+    tasks = "".join(
+        f"---\nTASK {n}:\n{_task_details(file_path, changes_summary)}"
+        for n, (file_path, changes_summary) in enumerate(jobs, start=1)
+    )
+    prompt = f"""{PROMPT_INSTRUCTIONS}
+For each of the following {len(jobs)} tasks, return one bash block per task, in order:
+{tasks}"""
+
+    try:
+        response = _get_client(api_key).chat.completions.create(
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            model=MODEL,
+            temperature=TEMPERATURE,
+            max_tokens=MAX_TOKENS_PER_COMMAND * len(jobs),
+        )
+        choice = response.choices[0]
+        raw_output = choice.message.content.strip()
+    except Exception:
+        return None
+
+    # The last block may be cut off mid-command - let each job retry on its own
+    if choice.finish_reason == "length":
+        return None
+
+    commands = [
+        block.strip().split("\n")[0].strip()
+        for block in BASH_BLOCK_RE.findall(raw_output)
+    ]
+    if len(commands) != len(jobs) or not all(commands):
+        return None
+    return commands
+
+
+def generate_run_commands_batch(jobs):
+    """
+    Generate run commands for several files, sharing one Groq call.
+
+    Files resolved from COMMAND_TABLE or the cache never reach Groq. The rest
+    are sent together; if the batched reply can't be matched up, each one
+    falls back to its own generate_run_command call.
+
+    Args:
+        jobs: List of (file_path, changes_summary) tuples
+
+    Returns:
+        list: One result dict per job, in order, shaped like generate_run_command
+    """
+    results = [None] * len(jobs)
+    pending = []
+
+    for i, (file_path, changes_summary) in enumerate(jobs):
+        command = _resolve_known_command(file_path)
+        if not command and TEMPERATURE == 0:
+            command = _get_cached_command(_job_cache_key(file_path, changes_summary))
+        if command:
+            results[i] = {"success": True, "command": command, "error": None}
+        else:
+            pending.append(i)
+
+    if len(pending) > 1:
+        commands = _generate_batch([jobs[i] for i in pending])
+        if commands:
+            for i, command in zip(pending, commands):
+                if TEMPERATURE == 0:
+                    _store_cached_command(_job_cache_key(*jobs[i]), command)
+                results[i] = {"success": True, "command": command, "error": None}
+            pending = []
+
+    for i in pending:
+        results[i] = generate_run_command(*jobs[i])
+
+    return results
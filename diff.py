@@ -1,108 +1,204 @@
-import json
 import hashlib
-import fnmatch
 from pathlib import Path
-import difflib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+import pathspec
+
+# Use the C implementation of SequenceMatcher when cdifflib is installed
+try:
+    from cdifflib import CSequenceMatcher as SequenceMatcher
+except ImportError:
+    from difflib import SequenceMatcher
+
+# Contents of every tracked file version, stored by hash - .state.json only
+# keeps the small path -> {hash, mtime_ns, size} index
+OBJECTS_DIR = Path(".state_objects")
+
+# Number of threads used to hash and read files during a scan
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def _new_hash():
+    """Hash used for change detection - 128-bit BLAKE2b, faster than MD5"""
+    return hashlib.blake2b(digest_size=16)
 
 
 def get_hash(path):
     try:
         with open(path, "rb") as f:
-            return hashlib.md5(f.read()).hexdigest()
+            # Streams the file in chunks instead of reading it into memory
+            return hashlib.file_digest(f, _new_hash).hexdigest()
     except Exception:
         return ""
 
 
-def get_content(path):
+def read_hash_and_bytes(path):
+    """Hash a file and return its raw bytes from a single read"""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
+        data = Path(path).read_bytes()
     except Exception:
+        return "", b""
+    digest = _new_hash()
+    digest.update(data)
+    return digest.hexdigest(), data
+
+
+def _object_path(file_hash):
+    return OBJECTS_DIR / f"{file_hash}.txt"
+
+
+def store_object(file_hash, data):
+    """Keep a copy of a file's contents under its hash, if not already stored"""
+    path = _object_path(file_hash)
+    if path.exists():
+        return
+    if not OBJECTS_DIR.is_dir():
+        OBJECTS_DIR.mkdir(exist_ok=True)
+        # Keep the store out of the user's own git repository
+        (OBJECTS_DIR / ".gitignore").write_text("*\n")
+    # Write under a unique name first so concurrent scans never see partial blobs
+    tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def load_object(file_hash):
+    """
+    Return the stored contents for a hash as text ("" if not stored).
+
+    Returns None for binary contents - anything that isn't valid UTF-8 or
+    contains a NUL byte - so it never reaches the diff (or the codex prompt).
+    """
+    try:
+        text = _object_path(file_hash).read_bytes().decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    except OSError:
         return ""
+    return None if "\x00" in text else text
+
+
+def prune_objects(state):
+    """Delete stored contents that no file in state refers to any more"""
+    keep = {f"{entry['hash']}.txt" for entry in state.values()}
+    try:
+        entries = list(os.scandir(OBJECTS_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.name.endswith(".txt") and entry.name not in keep:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
 
 
 def load_gitignore_patterns(folder):
-    """Load patterns from .gitignore file"""
+    """Compile the patterns from the .gitignore file into a single matcher"""
     gitignore_path = Path(folder) / ".gitignore"
-    patterns = []
+    lines = []
 
     if gitignore_path.exists():
         try:
             with open(gitignore_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    # Skip empty lines and comments
-                    if line and not line.startswith("#"):
-                        patterns.append(line)
+                lines = f.read().splitlines()
         except Exception:
             pass
 
-    return patterns
+    # Full gitignore semantics, including directory and negation (!) patterns
+    return pathspec.GitIgnoreSpec.from_lines(lines)
+
+
+def scan_file(path, prev_entry=None):
+    """
+    Build the state entry for one file.
+
+    Files whose mtime and size match the previous state are reused without
+    being opened. Otherwise the file is hashed, and its contents are copied
+    into the object store only when that hash hasn't been seen before.
+    """
+    try:
+        st = os.stat(path)
+        mtime_ns, size = st.st_mtime_ns, st.st_size
+    except OSError:
+        mtime_ns, size = None, None
+
+    # Same mtime and size as last run - trust the previous entry as-is
+    if (
+        prev_entry is not None
+        and mtime_ns is not None
+        and prev_entry.get("mtime_ns") == mtime_ns
+        and prev_entry.get("size") == size
+    ):
+        return prev_entry
+
+    if prev_entry is None:
+        file_hash, data = read_hash_and_bytes(path)
+        if file_hash:
+            store_object(file_hash, data)
+    else:
+        file_hash = get_hash(path)
+        if file_hash and file_hash != prev_entry.get("hash"):
+            store_object(file_hash, Path(path).read_bytes())
+
+    return {"hash": file_hash, "mtime_ns": mtime_ns, "size": size}
 
 
-def is_ignored(file_path, patterns):
-    """Check if a file path matches any gitignore pattern"""
-    file_path_str = str(file_path)
+def _walk(root, gitignore_spec, rel_dir=""):
+    """
+    Yield (relative path, DirEntry) for every tracked file under root.
+
+    Uses os.scandir so file-type checks come from the directory listing, and
+    prunes git metadata and gitignored directories instead of descending.
+    """
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
 
-    for pattern in patterns:
-        # Handle directory patterns (ending with /)
-        if pattern.endswith("/"):
-            if file_path_str.startswith(pattern) or ("/" + pattern) in file_path_str:
-                return True
-        # Handle negation patterns (starting with !)
-        elif pattern.startswith("!"):
-            # This is a negation pattern - would need more complex logic
-            # For now, we'll skip negation patterns
+    for entry in entries:
+        name = entry.name
+        if ".git" in name or name == OBJECTS_DIR.name:
             continue
-        # Handle glob patterns
-        else:
-            if fnmatch.fnmatch(file_path_str, pattern) or fnmatch.fnmatch(
-                file_path_str, "*/" + pattern
-            ):
-                return True
-            # Also check if any parent directory matches
-            parts = file_path_str.split("/")
-            for i in range(len(parts)):
-                partial_path = "/".join(parts[: i + 1])
-                if fnmatch.fnmatch(partial_path, pattern):
-                    return True
-
-    return False
-
-
-def scan(folder):
-    folder = Path(folder)
-    files = {}
-    gitignore_patterns = load_gitignore_patterns(folder)
-
-    for f in folder.rglob("*"):
-        if (
-            f.is_file()
-            and not f.name.startswith(".DS_Store")
-            and ".git" not in str(f)
-            and f.name != ".state.json"
+
+        rel_path = os.path.join(rel_dir, name)
+        posix_path = rel_path.replace(os.sep, "/")
+
+        if entry.is_dir(follow_symlinks=False):
+            if not gitignore_spec.match_file(posix_path + "/"):
+                yield from _walk(entry.path, gitignore_spec, rel_path)
+        elif (
+            entry.is_file()
+            and not name.startswith(".DS_Store")
+            and name != ".state.json"
+            and not gitignore_spec.match_file(posix_path)
         ):
-            relative_path = f.relative_to(folder)
+            yield rel_path, entry
 
-            # Check if file should be ignored based on gitignore patterns
-            if not is_ignored(relative_path, gitignore_patterns):
-                files[str(relative_path)] = {
-                    "hash": get_hash(f),
-                    "content": get_content(f),
-                }
-    return files
+
+def scan(folder, prev=None):
+    prev = prev or {}
+    gitignore_spec = load_gitignore_patterns(folder)
+
+    # Collect the tracked files first, then hash/read them concurrently
+    paths = dict(_walk(folder, gitignore_spec))
+
+    # File I/O and hashlib both release the GIL, so threads overlap the work
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        entries = executor.map(lambda key: scan_file(paths[key], prev.get(key)), paths)
+        return dict(zip(paths, entries))
 
 
 def save(data, fname):
-    with open(fname, "w") as f:
-        json.dump(data, f, indent=2)
+    Path(fname).write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 
 def load(fname):
     if Path(fname).exists():
         try:
-            with open(fname) as f:
-                return json.load(f) or {}
+            return orjson.loads(Path(fname).read_bytes()) or {}
         except Exception:
             return {}
     return {}
@@ -118,14 +214,25 @@ def format_content_for_diff(content, filename):
     if is_json_file(filename):
         try:
             # Try to parse and pretty-print JSON
-            parsed = json.loads(content)
-            return json.dumps(parsed, indent=2, sort_keys=True)
-        except (json.JSONDecodeError, ValueError):
+            parsed = orjson.loads(content)
+            return orjson.dumps(
+                parsed, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+            ).decode()
+        except (orjson.JSONDecodeError, orjson.JSONEncodeError):
             # If it's not valid JSON, return as-is
             pass
     return content
 
 
+def _intern_lines(old_lines, new_lines):
+    """Map each distinct line to a small int so the matcher compares ints, not strings"""
+    ids = {}
+    return (
+        [ids.setdefault(line, len(ids)) for line in old_lines],
+        [ids.setdefault(line, len(ids)) for line in new_lines],
+    )
+
+
 def show_diff(added, removed, modified, context_lines=2):
     """Display changes in a clean, simple format - returns string instead of printing"""
     output = []
@@ -157,6 +264,12 @@ def show_diff(added, removed, modified, context_lines=2):
             old_content = f["old_content"]
             new_content = f["new_content"]
 
+            # Binary contents get a single line instead of a line diff
+            if old_content is None or new_content is None:
+                output.append("  (Binary file changed)")
+                output.append("")
+                continue
+
             # Format content for better diffing (pretty-print JSON, etc.)
             old_formatted = format_content_for_diff(old_content, filename)
             new_formatted = format_content_for_diff(new_content, filename)
@@ -165,167 +278,97 @@ def show_diff(added, removed, modified, context_lines=2):
             old_lines = old_formatted.splitlines()
             new_lines = new_formatted.splitlines()
 
-            # Use SequenceMatcher for comparison
-            matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
-            opcodes = list(matcher.get_opcodes())
+            # Compare interned line ids; autojunk off so common lines in files
+            # over 200 lines aren't treated as junk and left unmatched
+            old_ids, new_ids = _intern_lines(old_lines, new_lines)
+            matcher = SequenceMatcher(None, old_ids, new_ids, autojunk=False)
 
             # Check if there are any changes
-            has_changes = any(tag != "equal" for tag, _, _, _, _ in opcodes)
+            has_changes = any(
+                tag != "equal" for tag, _, _, _, _ in matcher.get_opcodes()
+            )
             if not has_changes:
                 output.append("  (No textual differences found)")
                 output.append("")
                 continue
 
-            # Build hunks: regions to display (changes + context)
-            hunks = []
-            for tag, i1, i2, j1, j2 in opcodes:
-                if tag != "equal":
-                    # Include context around changes
-                    # For inserts where i1==i2, ensure we still create a valid hunk
-                    hunk_start = max(0, i1 - context_lines)
-                    hunk_end = min(len(old_lines), max(i1, i2) + context_lines)
-                    hunks.append((hunk_start, hunk_end, tag, i1, i2, j1, j2))
-
-            # Merge overlapping hunks and track which opcodes belong to each
-            if hunks:
-                merged_hunks = [(hunks[0][0], hunks[0][1], [hunks[0][2:]])]
-                for hunk_start, hunk_end, tag, i1, i2, j1, j2 in hunks[1:]:
-                    last_start, last_end, last_ops = merged_hunks[-1]
-                    if hunk_start <= last_end + 1:
-                        # Overlapping or adjacent, merge them
-                        merged_hunks[-1] = (
-                            last_start,
-                            max(last_end, hunk_end),
-                            last_ops + [(tag, i1, i2, j1, j2)],
-                        )
-                    else:
-                        merged_hunks.append(
-                            (hunk_start, hunk_end, [(tag, i1, i2, j1, j2)])
-                        )
-
-                # Start markdown diff block
-                output.append("```diff")
-
-                # Display each hunk
-                for hunk_idx, (hunk_start, hunk_end, hunk_ops) in enumerate(
-                    merged_hunks
-                ):
-                    # Show ellipsis if this isn't the first hunk
-                    if hunk_idx > 0:
-                        output.append("...")
-
-                    # Track current line numbers for old and new files
-                    old_line_num = hunk_start + 1
-                    new_line_num = hunk_start + 1
-
-                    # Calculate new_line_num offset by counting changes before this hunk
-                    for tag, i1, i2, j1, j2 in opcodes:
-                        if i1 >= hunk_start:
-                            break
-                        if tag == "insert":
-                            new_line_num += j2 - j1
-                        elif tag == "delete":
-                            new_line_num -= i2 - i1
-                        elif tag == "replace":
-                            new_line_num += (j2 - j1) - (i2 - i1)
-
-                    # Process all opcodes, showing context and changes
-                    for tag, i1, i2, j1, j2 in opcodes:
-                        # Check if this opcode overlaps with current hunk
-                        if tag == "equal":
-                            # For equal sections, only show if within hunk range
-                            start_idx = max(i1, hunk_start)
-                            end_idx = min(i2, hunk_end)
-                            if start_idx < end_idx:
-                                for idx in range(start_idx, end_idx):
-                                    output.append(
-                                        f"  {old_line_num:4d}  {old_lines[idx]}"
-                                    )
-                                    old_line_num += 1
-                                    new_line_num += 1
-                        else:
-                            # For changes, check if this change is part of current hunk
-                            change_in_hunk = False
-                            for change_tag, ci1, ci2, cj1, cj2 in hunk_ops:
-                                if (
-                                    tag == change_tag
-                                    and i1 == ci1
-                                    and i2 == ci2
-                                    and j1 == cj1
-                                    and j2 == cj2
-                                ):
-                                    change_in_hunk = True
-                                    break
-
-                            if not change_in_hunk:
-                                # Update line numbers for skipped changes
-                                if tag == "insert":
-                                    new_line_num += j2 - j1
-                                elif tag == "delete":
-                                    old_line_num += i2 - i1
-                                elif tag == "replace":
-                                    old_line_num += i2 - i1
-                                    new_line_num += j2 - j1
-                                continue
-
-                            if tag == "replace":
-                                # Show removed lines
-                                for idx in range(i1, i2):
-                                    output.append(
-                                        f"- {old_line_num:4d}  {old_lines[idx]}"
-                                    )
-                                    old_line_num += 1
-                                # Show added lines
-                                for idx in range(j1, j2):
-                                    output.append(
-                                        f"+ {new_line_num:4d}  {new_lines[idx]}"
-                                    )
-                                    new_line_num += 1
-
-                            elif tag == "delete":
-                                for idx in range(i1, i2):
-                                    output.append(
-                                        f"- {old_line_num:4d}  {old_lines[idx]}"
-                                    )
-                                    old_line_num += 1
-
-                            elif tag == "insert":
-                                # For inserts, show the new line numbers
-                                for idx in range(j1, j2):
-                                    output.append(
-                                        f"+ {new_line_num:4d}  {new_lines[idx]}"
-                                    )
-                                    new_line_num += 1
-
-                # End markdown diff block
-                output.append("```")
+            # Start markdown diff block
+            output.append("```diff")
+
+            # Display each hunk - the same change groups (with surrounding context)
+            # that difflib.unified_diff emits, rendered with per-line numbers
+            for hunk_idx, group in enumerate(
+                matcher.get_grouped_opcodes(context_lines)
+            ):
+                # Show ellipsis if this isn't the first hunk
+                if hunk_idx > 0:
+                    output.append("...")
+
+                # Line numbers come straight from the opcode offsets
+                # (old side i1.., new side j1..)
+                for tag, i1, i2, j1, j2 in group:
+                    if tag == "equal":
+                        # Context lines
+                        for idx in range(i1, i2):
+                            output.append(f"  {idx + 1:4d}  {old_lines[idx]}")
+                        continue
+
+                    # Removed lines (replace/delete), then added lines (replace/insert)
+                    for idx in range(i1, i2):
+                        output.append(f"- {idx + 1:4d}  {old_lines[idx]}")
+                    for idx in range(j1, j2):
+                        output.append(f"+ {idx + 1:4d}  {new_lines[idx]}")
+
+            # End markdown diff block
+            output.append("```")
 
             output.append("")
 
     return "\n".join(output)
 
 
-def main(folder=".", print_output=True):
+def main(folder=".", print_output=True, structured=False):
     """
     Main diff function - returns diff as string.
 
     Args:
         folder: Folder to scan for changes
         print_output: If True, prints output to console. If False, only returns string.
+        structured: If True, return the changed files alongside the string
 
     Returns:
-        String containing the diff output
+        String containing the diff output, or if structured is True a dict:
+        {"added": set, "modified": set, "deleted": set, "summary": str}
     """
     statefile = ".state.json"
 
-    curr = scan(folder)
     prev = load(statefile)
 
+    # Older state files kept every file's content inline - move it to the object store.
+    # Their hashes may be MD5, so rehash the content to keep unchanged files equal
+    for entry in prev.values():
+        if "content" in entry:
+            data = entry.pop("content").encode("utf-8")
+            digest = _new_hash()
+            digest.update(data)
+            entry["hash"] = digest.hexdigest()
+            store_object(entry["hash"], data)
+
+    curr = scan(folder, prev)
+
     if not prev:
         result = "First run - establishing baseline"
         if print_output:
             print(result)
         save(curr, statefile)
+        prune_objects(curr)
+        if structured:
+            return {
+                "added": set(),
+                "modified": set(),
+                "deleted": set(),
+                "summary": result,
+            }
         return result
 
     added = set(curr) - set(prev)
@@ -337,8 +380,8 @@ def main(folder=".", print_output=True):
             modified.append(
                 {
                     "file": f,
-                    "old_content": prev[f]["content"],
-                    "new_content": curr[f]["content"],
+                    "old_content": load_object(prev[f]["hash"]),
+                    "new_content": load_object(curr[f]["hash"]),
                 }
             )
 
@@ -365,6 +408,15 @@ def main(folder=".", print_output=True):
         print(result)
 
     save(curr, statefile)
+    # Only the saved index is diffed against next run - older versions can go
+    prune_objects(curr)
+    if structured:
+        return {
+            "added": added,
+            "modified": {f["file"] for f in modified},
+            "deleted": removed,
+            "summary": result,
+        }
     return result
 
 
@@ -0,0 +1,55 @@
+from diff import main, show_diff
+
+
+def test_show_diff_numbers_lines_in_every_hunk():
+    """Test that later hunks keep correct old- and new-side line numbers."""
+    old = [f"line {i}" for i in range(1, 31)]
+    new = list(old)
+    new[2] = "changed 3"
+    new.insert(10, "added")
+    new.remove("line 25")
+
+    output = show_diff(
+        set(),
+        set(),
+        [
+            {
+                "file": "a.py",
+                "old_content": "\n".join(old),
+                "new_content": "\n".join(new),
+            }
+        ],
+    )
+    lines = output.splitlines()
+
+    # Three separate hunks
+    assert lines.count("...") == 2
+
+    # Replacement in the first hunk
+    assert "-    3  line 3" in lines
+    assert "+    3  changed 3" in lines
+
+    # Insertion is numbered on the new side, the context after it on the old side
+    assert "+   11  added" in lines
+    assert "    11  line 11" in lines
+
+    # Deletion after the insertion still uses the old file's numbering
+    assert "    24  line 24" in lines
+    assert "-   25  line 25" in lines
+    assert "    26  line 26" in lines
+
+
+def test_main_reports_binary_changes_without_raw_bytes(tmp_path, monkeypatch):
+    """Test that a modified binary file never puts NUL bytes in the diff."""
+    monkeypatch.chdir(tmp_path)
+    binary = tmp_path / "App.class"
+
+    binary.write_bytes(bytes(range(256)) * 4)
+    main(print_output=False)
+
+    binary.write_bytes(bytes(reversed(range(256))) * 4)
+    output = main(print_output=False)
+
+    assert "~ App.class" in output
+    assert "(Binary file changed)" in output
+    assert "\x00" not in output
@@ -6,32 +6,30 @@ A clean, classic terminal interface for running natural code files
 
 import sys
 import os
+import functools
 import time
 import threading
 import random
 import subprocess
-from pathlib import Path
+from datetime import datetime
 from rich.console import Console
-from rich.live import Live
+from rich.markup import escape
 from rich.text import Text
-import cli
-import diff
-import command
 
 # Collection of fun ASCII animation styles - one is picked randomly per session
 ANIMATION_STYLES = {
-    "circle": ["◐", "◓", "◑", "◒"],
-    "dots": ["⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"],
-    "growing": ["·", "··", "···", "····", "·····", "····", "···", "··"],
-    "arrows": ["→", "⇢", "⇉", "➜", "⇉", "⇢"],
-    "bounce": ["◡", "◠", "◡", "◠"],
-    "pulse": ["○", "◎", "●", "◎"],
-    "dance": ["⊂", "⊃", "⊂", "⊃"],
-    "wave": ["~", "≈", "≋", "≈"],
-    "blocks": ["▁", "▃", "▅", "▆", "▇", "█", "▇", "▆", "▅", "▃"],
-    "sparkle": ["✦", "✧", "★", "✧"],
-    "pipe": ["|", "/", "—", "\\"],
-    "progress": [
+    "circle": ("◐", "◓", "◑", "◒"),
+    "dots": ("⠋", "⠙", "⠹", "⠸", "⠼", "⠴", "⠦", "⠧", "⠇", "⠏"),
+    "growing": ("·", "··", "···", "····", "·····", "····", "···", "··"),
+    "arrows": ("→", "⇢", "⇉", "➜", "⇉", "⇢"),
+    "bounce": ("◡", "◠", "◡", "◠"),
+    "pulse": ("○", "◎", "●", "◎"),
+    "dance": ("⊂", "⊃", "⊂", "⊃"),
+    "wave": ("~", "≈", "≋", "≈"),
+    "blocks": ("▁", "▃", "▅", "▆", "▇", "█", "▇", "▆", "▅", "▃"),
+    "sparkle": ("✦", "✧", "★", "✧"),
+    "pipe": ("|", "/", "—", "\\"),
+    "progress": (
         "[    ]",
         "[=   ]",
         "[==  ]",
@@ -40,11 +38,11 @@ ANIMATION_STYLES = {
         "[ ===]",
         "[  ==]",
         "[   =]",
-    ],
-    "clock": ["◷", "◶", "◵", "◴"],
-    "squares": ["◰", "◳", "◲", "◱"],
-    "triangles": ["◢", "◣", "◤", "◥"],
-    "asterix": [
+    ),
+    "clock": ("◷", "◶", "◵", "◴"),
+    "squares": ("◰", "◳", "◲", "◱"),
+    "triangles": ("◢", "◣", "◤", "◥"),
+    "asterix": (
         "✢",
         "✣",
         "✤",
@@ -88,11 +86,14 @@ ANIMATION_STYLES = {
         "❊",
         "❋",
         "❍",
-    ],
+    ),
 }
 
+# Style names, frozen once for the per-session random pick
+_ANIMATION_KEYS = tuple(ANIMATION_STYLES)
+
 # Fun ASCII-style status messages that rotate during code generation
-FUN_VERBS = [
+FUN_VERBS = (
     "* thinking about this...",
     "> sketching the logic...",
     "~ focusing on the details...",
@@ -130,7 +131,69 @@ FUN_VERBS = [
     "> assembling the pieces...",
     "+ cooking up something good...",
     "* conjuring the code...",
-]
+)
+
+# Shared console for the runner, logo and help text
+_CONSOLE = Console()
+
+# One logo expansion frame: cursor home, down to row 5, clear that line,
+# then the text between {h}/{r} style codes - redraws in place instead of
+# clearing the screen
+_LOGO_FRAME = "\x1b[H\n\n\n\n\x1b[2K        {h}{text}{r}\n"
+
+# Usage text for --help, with {h}/{r} around headings for bold cyan on a terminal
+HELP_TEXT = """  {h}Overview{r}
+  Natural code transforms plain English descriptions into executable code.
+  Write what you want. Get code that works.
+
+  {h}Usage{r}
+  nrun <filename>.n<lang>
+
+  {h}Quick Start{r}
+  1. Create file with .n<language> extension
+  2. Describe your program in plain English
+  3. Run with nrun
+
+  {h}Example{r}
+  $ echo "Build a calculator with add and subtract" > calc.npy
+  $ nrun calc.npy
+
+  {h}Supported Extensions{r}
+  .npy .njs .njava .ngo .nrs .nts
+
+  {h}Setup{r}
+  Set GROQ_API in your .env file
+
+  ─────────────────────────────────────────────
+"""
+
+# Characters of the latest codex output line shown under the fun verb
+CODEX_LINE_WIDTH = 70
+
+# Rendered frames each fun verb stays on screen (~2 seconds at 12 fps)
+VERB_FRAMES = 25
+
+
+def _heading_codes():
+    """
+    ANSI (start, end) codes for bold cyan text written around Rich, matching
+    what _CONSOLE would emit - none without colour support (pipes, TERM=dumb),
+    bold only under NO_COLOR.
+    """
+    if _CONSOLE.color_system is None:
+        return "", ""
+    if _CONSOLE.no_color:
+        return "\x1b[1m", "\x1b[0m"
+    return "\x1b[1;36m", "\x1b[0m"
+
+
+@functools.lru_cache(maxsize=128)
+def _validate_extension(filename):
+    """Return (ok, lang) for a .n<language> filename, cached per filename"""
+    _, sep, lang = filename.rpartition(".n")
+    if not sep or not lang.isalnum():
+        return False, None
+    return True, lang
 
 
 class NaturalCodeRunner:
@@ -138,59 +201,81 @@ class NaturalCodeRunner:
 
     def __init__(self, filename):
         self.filename = filename
-        self.console = Console()
-        self.animation_running = True
+        self.console = _CONSOLE
+        self._done = threading.Event()  # Set once run_natural_code has returned
         self.current_frame = 0
         self.status = "Initializing..."
         self.error = None
 
         # Pick a random animation style for this session
-        self.animation_style = random.choice(list(ANIMATION_STYLES.keys()))
+        self.animation_style = random.choice(_ANIMATION_KEYS)
         self.animation_frames = ANIMATION_STYLES[self.animation_style]
 
-        # Track verb rotation - used when codex is actively generating
-        self.verb_index = 0
-        self.last_verb_time = time.time()
+        # Styled frames and verbs, built once instead of on every render
+        self._frame_texts = tuple(Text(f, style="cyan") for f in self.animation_frames)
+        self._verb_texts = tuple(Text(v, style="cyan") for v in FUN_VERBS)
+
+        # Rendered frame count - drives verb rotation while codex is generating
+        self._frame_tick = 0
         self.use_fun_verbs = False  # Flag to show we're in code generation mode
+        self.codex_line = None  # Latest line of codex output, shown under the verb
+
+        # Rendered displays by animation frame, for the current status line only
+        self._display_status = None
+        self._display_cache = {}
 
     def get_animation_frame(self):
         """Get the current animation frame"""
-        frame = self.animation_frames[self.current_frame]
+        frame = self._frame_texts[self.current_frame]
         self.current_frame = (self.current_frame + 1) % len(self.animation_frames)
         return frame
 
     def get_fun_verb(self):
         """Get a fun verb, rotating through them"""
-        # Rotate verbs every 2 seconds
-        if time.time() - self.last_verb_time > 2.0:
-            self.verb_index = (self.verb_index + 1) % len(FUN_VERBS)
-            self.last_verb_time = time.time()
-        return FUN_VERBS[self.verb_index]
+        # Rotate verbs every VERB_FRAMES rendered frames
+        return self._verb_texts[(self._frame_tick // VERB_FRAMES) % len(FUN_VERBS)]
+
+    def on_codex_output(self, chunk):
+        """Remember the last non-empty line of codex output"""
+        for line in reversed(chunk.decode("utf-8", errors="replace").splitlines()):
+            if line.strip():
+                self.codex_line = line.strip()
+                break
 
     def create_display(self):
         """Create clean, minimal display"""
-        lines = []
-
-        # Simple header with filename and animation - teal/cyan theme
-        lines.append("")
-        header_text = Text()
-        header_text.append("  nrun ", style="bold cyan")
-        header_text.append(self.get_animation_frame(), style="cyan")
-
-        display = Text()
-        display.append(header_text)
-        display.append("\n\n")
-        display.append(f"  {self.filename}\n\n", style="dim")
+        self._frame_tick += 1
 
         # Status - show fun verbs during code generation, normal status otherwise
         if self.error:
-            display.append(f"  ✗ {self.error}", style="red")
+            status = ((f"  ✗ {self.error}", "red"),)
         elif self.use_fun_verbs:
-            display.append(f"  {self.get_fun_verb()}", style="cyan")
+            status = ("  ", self.get_fun_verb())
+            # Latest codex output under the verb, so real progress is visible
+            if self.codex_line:
+                status += ((f"\n  {self.codex_line[:CODEX_LINE_WIDTH]}", "dim"),)
         else:
-            display.append(f"  {self.status}", style="dim")
-        display.append("\n")
-
+            status = ((f"  {self.status}", "dim"),)
+
+        # Reuse displays already built for this status - only the frame cycles
+        if status != self._display_status:
+            self._display_status = status
+            self._display_cache = {}
+
+        frame_index = self.current_frame
+        frame = self.get_animation_frame()
+        display = self._display_cache.get(frame_index)
+        if display is None:
+            # Simple header with filename and animation - teal/cyan theme
+            display = Text.assemble(
+                ("  nrun ", "bold cyan"),
+                frame,
+                "\n\n",
+                (f"  {self.filename}\n\n", "dim"),
+                *status,
+                "\n",
+            )
+            self._display_cache[frame_index] = display
         return display
 
     def update_status(self, new_status):
@@ -200,38 +285,37 @@ class NaturalCodeRunner:
     def set_error(self, error_message):
         """Set an error message"""
         self.error = error_message
-        self.animation_running = False
 
     def run_natural_code(self):
         """Run the natural code file through cli.py"""
         try:
+            # Imported here so `nrun --help` doesn't load the runner's dependencies
+            import cli
+            import command
+            import diff
+
             self.update_status("Validating file...")
-            time.sleep(0.3)
 
             # Validate file exists and has correct extension
-            path = Path(self.filename)
-            if not path.exists():
+            try:
+                os.stat(self.filename)
+            except FileNotFoundError:
                 self.set_error(f"File not found: {self.filename}")
                 return False, None, None, None
 
             # Check for .n<language> extension
-            import re
-
-            match = re.search(r"\.n(\w+)$", self.filename)
-            if not match:
+            ok, lang = _validate_extension(self.filename)
+            if not ok:
                 self.set_error(
                     "File must have .n<language> extension (e.g., .npy, .njs)"
                 )
                 return False, None, None, None
 
-            lang = match.group(1)
             self.update_status(f"Detected language: {lang}")
-            time.sleep(0.3)
 
             # Load environment
             self.update_status("Loading environment...")
             cli.load_env_file()
-            time.sleep(0.2)
 
             # Get API key
             groq_api_key = os.getenv("GROQ_API")
@@ -240,60 +324,57 @@ class NaturalCodeRunner:
                 return False, None, None, None
 
             self.update_status("Analyzing changes...")
-            time.sleep(0.3)
 
             # Get absolute path
-            tagged_file = str(path.resolve())
+            tagged_file = os.path.abspath(self.filename)
 
             # Create log directory
             cli.ensure_log_dir()
-            log_file = cli.get_log_filepath(self.filename)
+            now = datetime.now()
+            log_file = cli.get_log_filepath(self.filename, now)
 
             self.update_status("Constructing prompt...")
-            time.sleep(0.3)
 
             # Build prompt
             full_prompt = cli.cli_prompt(tagged_file)
 
             self.update_status("Executing via Codex...")
-            time.sleep(0.5)
-
-            # Run codex
-            cli.run_codex(
-                full_prompt,
-                tagged_file,
-                groq_api_key,
-                log_file,
-                show_output=False,  # We'll handle output ourselves
-            )
 
-            # Enable fun verbs mode - codex is now actively generating code!
+            # Fun verbs rotate for as long as codex is actually generating code
             self.use_fun_verbs = True
-            time.sleep(4.0)  # Let fun verbs rotate for a bit
+            try:
+                returncode = cli.run_codex(
+                    full_prompt,
+                    tagged_file,
+                    groq_api_key,
+                    log_file,
+                    show_output=False,  # We'll handle output ourselves
+                    now=now,
+                    wait=True,
+                    on_output=self.on_codex_output,
+                )
+            finally:
+                self.use_fun_verbs = False
 
-            # Continue showing fun verbs a bit longer
-            time.sleep(2.0)
+            if returncode != 0:
+                self.set_error(f"Codex exited with code {returncode}")
+                return False, None, None, None
 
-            # Disable fun verbs and show completion
-            self.use_fun_verbs = False
             self.update_status("Checking for changes...")
-            time.sleep(0.5)
 
             # Get file changes using diff.py
-            changes_summary = diff.main(folder=".", print_output=False)
+            changes = diff.main(folder=".", print_output=False, structured=True)
 
             # Generate terminal command using Groq
             self.update_status("Generating run command...")
-            time.sleep(0.3)
             command_result = command.generate_run_command(
-                self.filename, changes_summary
+                self.filename, changes["summary"]
             )
 
             # Execute the generated command if successful
             command_output = None
             if command_result["success"]:
                 self.update_status("Running generated command...")
-                time.sleep(0.3)
                 try:
                     # Execute the command
                     result = subprocess.run(
@@ -308,15 +389,22 @@ class NaturalCodeRunner:
                         "stderr": result.stderr,
                         "returncode": result.returncode,
                     }
+                    failed = result.returncode != 0
                 except subprocess.TimeoutExpired:
+                    # Still running after 30s doesn't mean the command is wrong
                     command_output = {"error": "Command execution timeout (30s)"}
+                    failed = False
                 except Exception as e:
                     command_output = {"error": f"Execution error: {str(e)}"}
+                    failed = True
+
+                # A command that failed to run shouldn't be served from the cache again
+                if failed:
+                    command.forget_command(self.filename, changes["summary"])
 
             self.update_status(f"Complete! Check log: {log_file.name}")
-            time.sleep(1.0)
 
-            return True, changes_summary, command_result, command_output
+            return True, changes, command_result, command_output
 
         except Exception as e:
             self.set_error(f"Error: {str(e)}")
@@ -324,41 +412,42 @@ class NaturalCodeRunner:
 
     def run(self):
         """Main run method with live display"""
-        execution_thread = None
         success = False
-        changes_summary = None
+        changes = None
         command_result = None
         command_output = None
 
+        from rich.live import Live
+
         try:
+            # Live redraws from create_display on its own refresh thread
             with Live(
-                self.create_display(),
+                get_renderable=self.create_display,
                 console=self.console,
                 refresh_per_second=12,
                 transient=False,
-            ) as live:
+            ):
                 # Start execution in background thread
                 def execute():
-                    nonlocal success, changes_summary, command_result, command_output
-                    success, changes_summary, command_result, command_output = (
-                        self.run_natural_code()
-                    )
-                    self.animation_running = False
+                    nonlocal success, changes, command_result, command_output
+                    try:
+                        success, changes, command_result, command_output = (
+                            self.run_natural_code()
+                        )
+                    finally:
+                        # Always wake the main thread, even if the runner raised
+                        self._done.set()
 
                 execution_thread = threading.Thread(target=execute, daemon=True)
                 execution_thread.start()
 
-                # Keep updating the display while animation is running
-                while self.animation_running:
-                    live.update(self.create_display())
-                    time.sleep(0.08)
+                # Sleep until execution finishes - no polling needed
+                self._done.wait()
 
-                # Wait for execution to complete
-                if execution_thread:
-                    execution_thread.join(timeout=1.0)
+                # _done is only set on the way out, so this returns promptly
+                execution_thread.join()
 
-                # Final update
-                live.update(self.create_display())
+                # Hold the final frame briefly (Live redraws it on exit)
                 time.sleep(0.5)
 
             # Print final message
@@ -372,8 +461,8 @@ class NaturalCodeRunner:
                 )
 
                 # Display file changes summary - single line with color coding
-                if changes_summary:
-                    self._display_changes_summary(changes_summary)
+                if changes:
+                    self._display_changes_summary(changes)
 
                 # Display generated command
                 if command_result and command_result["success"]:
@@ -393,64 +482,27 @@ class NaturalCodeRunner:
             self.console.print(f"\n  ✗ Unexpected error: {e}")
             return 1
 
-    def _display_changes_summary(self, changes_summary):
-        """Parse and display file changes in a single line with color coding"""
-        lines = changes_summary.split("\n")
-
-        added = set()
-        modified = set()
-        deleted = set()
-
-        # Parse only the summary section (before detailed diffs)
-        in_summary = False
-        for line in lines:
-            line_stripped = line.strip()
-
-            # Start of summary section
-            if line_stripped == "Changes:":
-                in_summary = True
-                continue
-
-            # Stop parsing when we hit detailed diff sections
-            if line_stripped in [
-                "NEW FILES:",
-                "DELETED FILES:",
-                "Modified files:",
-                "```diff",
-            ]:
-                break
-
-            # Parse file names only in summary section
-            if in_summary:
-                if line_stripped.startswith("+ "):
-                    added.add(line_stripped[2:])
-                elif line_stripped.startswith("~ "):
-                    modified.add(line_stripped[2:])
-                elif line_stripped.startswith("- "):
-                    deleted.add(line_stripped[2:])
+    def _display_changes_summary(self, changes):
+        """Display file changes from diff.main in a single line with color coding"""
+        added, modified, deleted = (
+            changes["added"],
+            changes["modified"],
+            changes["deleted"],
+        )
 
-        # Build the display text with color coding
+        # Build the whole line as markup - file names are escaped so brackets
+        # in a path aren't read as tags
         if added or modified or deleted:
-            display = Text("  ")
-
+            parts = []
             if added:
-                display.append("+ ", style="green")
-                display.append(", ".join(sorted(added)), style="green")
-
+                parts.append(f"[green]+ {escape(', '.join(sorted(added)))}[/green]")
             if modified:
-                if added:
-                    display.append("  ", style="dim")
-                display.append("~ ", style="yellow")
-                display.append(", ".join(sorted(modified)), style="yellow")
-
+                parts.append(
+                    f"[yellow]~ {escape(', '.join(sorted(modified)))}[/yellow]"
+                )
             if deleted:
-                if added or modified:
-                    display.append("  ", style="dim")
-                display.append("- ", style="red")
-                display.append(", ".join(sorted(deleted)), style="red")
-
-            display.append("\n")
-            self.console.print(display)
+                parts.append(f"[red]- {escape(', '.join(sorted(deleted)))}[/red]")
+            self.console.print("  " + "  ".join(parts) + "\n", highlight=False)
         else:
             self.console.print("  No changes\n", style="dim")
 
@@ -493,7 +545,10 @@ class NaturalCodeRunner:
 
 def show_animated_logo():
     """Show animated expansion from 'nrun' to 'natural run' then big NRUN logo"""
-    console = Console()
+    console = _CONSOLE
+
+    # Animating needs a terminal that understands cursor codes - not a pipe or TERM=dumb
+    interactive = console.is_terminal and not console.is_dumb_terminal
 
     # Text expansion frames
     text_frames = [
@@ -507,20 +562,22 @@ def show_animated_logo():
         "natural run",
     ]
 
-    console.clear()
-
-    # Animate the text expansion - slower with normal font
-    for frame in text_frames:
+    if interactive:
         console.clear()
-        console.print("\n\n\n")
-        console.print(f"        {frame}", style="bold cyan")
-        time.sleep(0.12)  # Slightly faster for better flow
+        bold_cyan, reset = _heading_codes()
 
-    # Pause before showing big logo
-    time.sleep(0.2)
+        # Animate the text expansion - slower with normal font
+        for frame in text_frames:
+            sys.stdout.write(_LOGO_FRAME.format(h=bold_cyan, text=frame, r=reset))
+            sys.stdout.flush()
+            time.sleep(0.12)  # Slightly faster for better flow
+
+        # Pause before showing big logo
+        time.sleep(0.2)
 
     # Show the big pixelated NRUN logo with tagline
-    console.clear()
+    if interactive:
+        console.clear()
     console.print("")
     console.print("  ███╗   ██╗██████╗ ██╗   ██╗███╗   ██╗", style="bold cyan")
     console.print("  ████╗  ██║██╔══██╗██║   ██║████╗  ██║", style="bold cyan")
@@ -539,43 +596,14 @@ def main():
     if len(sys.argv) == 1 or sys.argv[1] in ["-h", "--help", "help"]:
         show_animated_logo()
 
-        # Show usage information
-        console = Console()
-
-        # What is Natural Code?
-        console.print("  [bold cyan]Overview[/bold cyan]")
-        console.print(
-            "  Natural code transforms plain English descriptions into executable code."
-        )
-        console.print("  Write what you want. Get code that works.\n")
-
-        # Usage
-        console.print("  [bold cyan]Usage[/bold cyan]")
-        console.print("  nrun <filename>.n<lang>\n")
-
-        # Quick Start
-        console.print("  [bold cyan]Quick Start[/bold cyan]")
-        console.print("  1. Create file with .n<language> extension")
-        console.print("  2. Describe your program in plain English")
-        console.print("  3. Run with nrun\n")
-
-        # Example
-        console.print("  [bold cyan]Example[/bold cyan]")
-        console.print('  $ echo "Build a calculator with add and subtract" > calc.npy')
-        console.print("  $ nrun calc.npy\n")
-
-        # Supported Languages
-        console.print("  [bold cyan]Supported Extensions[/bold cyan]")
-        console.print("  .npy .njs .njava .ngo .nrs .nts\n")
-
-        # Setup
-        console.print("  [bold cyan]Setup[/bold cyan]")
-        console.print("  Set GROQ_API in your .env file\n")
+        # Show usage information - static text, written without going through Rich
+        bold_cyan, reset = _heading_codes()
+        sys.stdout.write(HELP_TEXT.format(h=bold_cyan, r=reset))
+        sys.stdout.flush()
 
         # Footer
-        console.print("  ─────────────────────────────────────────────")
-        console.print("  v0.2.0 • github.com/idhant297/natural-code")
-        console.print("")
+        _CONSOLE.print("  v0.2.0 • github.com/idhant297/natural-code")
+        _CONSOLE.print("")
         sys.exit(0)
 
     # Normal execution with file argument